@@ -12,7 +12,7 @@
 
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog, simpledialog
-import sqlite3, os, csv
+import sqlite3, os, csv, io, math
 from decimal import Decimal, InvalidOperation
 
 DB_FILE = "database.db"
@@ -20,9 +20,21 @@ DB_FILE = "database.db"
 # -------------------------
 # DB SETUP
 # -------------------------
+_CONN = None
+
 def init_db():
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
+    # Eine dauerhafte Verbindung für die ganze Laufzeit (Tkinter ist single-threaded)
+    global _CONN
+    if _CONN is None:
+        _CONN = sqlite3.connect(f"file:{DB_FILE}?mode=rwc", uri=True, check_same_thread=False, isolation_level=None)
+        c = _CONN.cursor()
+        c.execute("PRAGMA journal_mode=WAL")
+        c.execute("PRAGMA synchronous=NORMAL")
+        c.execute("PRAGMA temp_store=MEMORY")
+        c.execute("PRAGMA cache_size=-20000")
+        c.execute("PRAGMA mmap_size=67108864")
+        _CONN.row_factory = sqlite3.Row
+    c = _CONN.cursor()
     c.execute("""CREATE TABLE IF NOT EXISTS printers (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         model TEXT UNIQUE NOT NULL,
@@ -37,6 +49,10 @@ def init_db():
         reach INTEGER NOT NULL,
         UNIQUE(printer_id,kleur)
     )""")
+    # Covering-Index: Materialabfragen kommen ohne Zugriff auf die Tabellenzeilen aus
+    c.execute("CREATE INDEX IF NOT EXISTS idx_cons_pid_kleur ON consumables(printer_id,kleur,price,reach)")
+    # model ist UNIQUE und damit schon indiziert; früher angelegten Doppel-Index entfernen
+    c.execute("DROP INDEX IF EXISTS idx_printers_model")
     c.execute("""CREATE TABLE IF NOT EXISTS profiles (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         name TEXT UNIQUE NOT NULL,
@@ -44,109 +60,134 @@ def init_db():
         cov_color REAL NOT NULL,
         color_share REAL NOT NULL
     )""")
-    conn.commit()
-    conn.close()
+
+def close_db():
+    global _CONN
+    if _CONN is not None:
+        _CONN.close(); _CONN = None
 
 # -------------------------
 # Helpers
 # -------------------------
+_COMMA_TO_DOT = str.maketrans({',': '.'})
+
 def to_float(val, default=0.0):
     try:
-        return float(str(val).strip().replace(',', '.'))
+        return float(str(val).strip().translate(_COMMA_TO_DOT))
     except Exception:
         return default
 
 def to_int(val, default=0):
     try:
-        return int(float(str(val).strip().replace(',', '.')))
+        return int(float(str(val).strip().translate(_COMMA_TO_DOT)))
     except Exception:
         return default
 
+def write_csv(path, header, rows):
+    # CSV komplett im Speicher aufbauen und mit einem einzigen write() schreiben
+    buf = io.StringIO()
+    w = csv.writer(buf)
+    w.writerow(header)
+    w.writerows(rows)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        f.write(buf.getvalue())
+
 # -------------------------
 # DB Operations
 # -------------------------
 def add_printer_db(model, price, is_color):
-    conn = sqlite3.connect(DB_FILE); c = conn.cursor()
+    c = _CONN.cursor()
     c.execute("INSERT INTO printers (model,price,is_color) VALUES (?,?,?)", (model, price, 1 if is_color else 0))
-    conn.commit(); conn.close()
 
 def update_printer_db(pid, model, price, is_color):
-    conn = sqlite3.connect(DB_FILE); c = conn.cursor()
+    c = _CONN.cursor()
     c.execute("UPDATE printers SET model=?, price=?, is_color=? WHERE id=?", (model, price, 1 if is_color else 0, pid))
-    conn.commit(); conn.close()
 
 def delete_printer_db(pid):
-    conn = sqlite3.connect(DB_FILE); c = conn.cursor()
-    c.execute("DELETE FROM consumables WHERE printer_id=?", (pid,))
-    c.execute("DELETE FROM printers WHERE id=?", (pid,))
-    conn.commit(); conn.close()
-
-def list_printers_db(search_filter=None):
-    conn = sqlite3.connect(DB_FILE); c = conn.cursor()
-    if search_filter:
-        like = f"%{search_filter}%"
-        c.execute("SELECT id,model,price,is_color FROM printers WHERE model LIKE ? ORDER BY model", (like,))
-    else:
-        c.execute("SELECT id,model,price,is_color FROM printers ORDER BY model")
-    rows = c.fetchall(); conn.close(); return rows
+    with _CONN:
+        c = _CONN.cursor()
+        c.execute("BEGIN")
+        c.execute("DELETE FROM consumables WHERE printer_id=?", (pid,))
+        c.execute("DELETE FROM printers WHERE id=?", (pid,))
+
+def list_printers_db():
+    c = _CONN.cursor()
+    c.execute("SELECT id,model,price,is_color FROM printers ORDER BY model")
+    return c.fetchall()
 
 def get_printer_db(pid):
-    conn = sqlite3.connect(DB_FILE); c = conn.cursor()
+    c = _CONN.cursor()
     c.execute("SELECT id,model,price,is_color FROM printers WHERE id=?", (pid,))
-    r = c.fetchone(); conn.close(); return r
+    return c.fetchone()
 
 def add_consumable_db(printer_id, kleur, price, reach):
-    conn = sqlite3.connect(DB_FILE); c = conn.cursor()
+    c = _CONN.cursor()
     c.execute("INSERT OR REPLACE INTO consumables (printer_id,kleur,price,reach) VALUES (?,?,?,?)", (printer_id, kleur, price, reach))
-    conn.commit(); conn.close()
+
+def add_consumables_db(rows):
+    # rows: [(printer_id, kleur, price, reach), ...] in einer Transaktion
+    with _CONN:
+        c = _CONN.cursor()
+        c.execute("BEGIN")
+        c.executemany("INSERT OR REPLACE INTO consumables (printer_id,kleur,price,reach) VALUES (?,?,?,?)", rows)
 
 def delete_consumable_db(cid):
-    conn = sqlite3.connect(DB_FILE); c = conn.cursor()
+    c = _CONN.cursor()
     c.execute("DELETE FROM consumables WHERE id=?", (cid,))
-    conn.commit(); conn.close()
 
 def list_consumables_db(printer_id=None):
-    conn = sqlite3.connect(DB_FILE); c = conn.cursor()
+    c = _CONN.cursor()
     if printer_id:
         c.execute("SELECT id,printer_id,kleur,price,reach FROM consumables WHERE printer_id=? ORDER BY kleur", (printer_id,))
     else:
         c.execute("SELECT id,printer_id,kleur,price,reach FROM consumables ORDER BY printer_id,kleur")
-    rows = c.fetchall(); conn.close(); return rows
+    return c.fetchall()
 
 def get_consumable_db(printer_id, kleur):
-    conn = sqlite3.connect(DB_FILE); c = conn.cursor()
+    c = _CONN.cursor()
     c.execute("SELECT price,reach FROM consumables WHERE printer_id=? AND kleur=?", (printer_id,kleur))
-    r = c.fetchone(); conn.close(); return r
+    return c.fetchone()
+
+def list_consumables_for_printers_db(ids):
+    # {printer_id: {kleur: (price, reach)}} für alle angegebenen Drucker in einer Abfrage
+    res = {pid: {} for pid in ids}
+    if not ids: return res
+    c = _CONN.cursor()
+    c.execute("SELECT printer_id,kleur,price,reach FROM consumables WHERE printer_id IN (%s)" % ",".join("?"*len(ids)), tuple(ids))
+    for r in c.fetchall():
+        res.setdefault(r["printer_id"], {})[r["kleur"]] = (r["price"], r["reach"])
+    return res
 
 def save_profile_db(name, cov_sw, cov_color, color_share):
-    conn = sqlite3.connect(DB_FILE); c = conn.cursor()
+    c = _CONN.cursor()
     c.execute("INSERT OR REPLACE INTO profiles (name,cov_sw,cov_color,color_share) VALUES (?,?,?,?)", (name, cov_sw, cov_color, color_share))
-    conn.commit(); conn.close()
 
 def load_profiles_db():
-    conn = sqlite3.connect(DB_FILE); c = conn.cursor()
+    c = _CONN.cursor()
     c.execute("SELECT id,name,cov_sw,cov_color,color_share FROM profiles ORDER BY name")
-    rows = c.fetchall(); conn.close(); return rows
+    return c.fetchall()
 
 # -------------------------
 # Calc logic
 # -------------------------
-def compute_costs_for_printer(printer_id, cov_sw_pct, cov_color_pct):
-    p = get_printer_db(printer_id)
+def compute_costs_for_printer(p, consumables, cov_sw_pct, cov_color_pct):
+    # p: Druckerzeile (id,model,price,is_color), consumables: {kleur: (price, reach)}
     if not p: return (None,None,{"error":"Drucker nicht gefunden"})
-    _, model, price, is_color = p
-    black = get_consumable_db(printer_id, "Schwarz")
+    model = p["model"]; is_color = p["is_color"]
+    black = consumables.get("Schwarz")
     if not black:
         return (None,None,{"error":"Kein schwarzes Verbrauchsmaterial eingetragen"})
     price_black, reach_black = black
     reach_black = max(1, int(reach_black))
     cost_black_per_5 = float(price_black) / reach_black
-    sw_page_cost = cost_black_per_5 * (cov_sw_pct / 5.0)
+    k_sw = cov_sw_pct / 5.0
+    k_color = cov_color_pct / 5.0
+    sw_page_cost = cost_black_per_5 * k_sw
     color_page_cost = None
     if is_color:
-        c_col = get_consumable_db(printer_id, "Cyan")
-        m_col = get_consumable_db(printer_id, "Magenta")
-        y_col = get_consumable_db(printer_id, "Yellow")
+        c_col = consumables.get("Cyan")
+        m_col = consumables.get("Magenta")
+        y_col = consumables.get("Yellow")
         base = None
         for x in (c_col, m_col, y_col):
             if x:
@@ -160,16 +201,35 @@ def compute_costs_for_printer(printer_id, cov_sw_pct, cov_color_pct):
                 prices[name] = float(raw[0]); reaches[name] = max(1,int(raw[1]))
             else:
                 prices[name] = float(base[0]); reaches[name] = max(1,int(base[1]))
-        cost_black_at_color = cost_black_per_5 * (cov_color_pct / 5.0)
-        color_components = 0.0
-        for name in ("Cyan","Magenta","Yellow"):
-            cost_per_5 = prices[name] / reaches[name]
-            color_components += cost_per_5 * (cov_color_pct / 5.0)
-        color_page_cost = cost_black_at_color + color_components
+        sum_cmy = prices["Cyan"]/reaches["Cyan"] + prices["Magenta"]/reaches["Magenta"] + prices["Yellow"]/reaches["Yellow"]
+        color_page_cost = k_color * (cost_black_per_5 + sum_cmy)
     else:
         color_page_cost = sw_page_cost
     return (sw_page_cost, color_page_cost, {"model":model, "is_color":bool(is_color)})
 
+def _pages_str(ratio):
+    # Seiten bis Break-even; bei (fast) gleichen Seitenpreisen kann der Quotient unendlich werden
+    return str(int(ratio) + 1) if math.isfinite(ratio) else "-"
+
+def compare_costs(prices, sw_costs, color_costs, color_share):
+    # Liefert (Durchschnittskosten, Break-even) je Drucker; Break-even gegenüber dem günstigsten Anschaffungspreis
+    n = len(prices)
+    if not n: return [], []
+    cs = color_share/100.0
+    base = min(range(n), key=prices.__getitem__)
+    avg = [cs*col + (1.0 - cs)*sw if sw is not None and col is not None else None for sw, col in zip(sw_costs, color_costs)]
+    baseline_price = prices[base]; baseline_avg = avg[base]
+    be = []
+    for i in range(n):
+        b = "-"
+        if i != base and avg[i] is not None and baseline_avg is not None:
+            if prices[i] > baseline_price and avg[i] < baseline_avg:
+                denom = baseline_avg - avg[i]
+                if denom > 0:
+                    b = _pages_str((prices[i] - baseline_price) / denom)
+        be.append(b)
+    return avg, be
+
 # -------------------------
 # App UI
 # -------------------------
@@ -178,7 +238,10 @@ class App(tk.Tk):
         super().__init__()
         self.title("Druckerpreisrechner (Comfort)")
         self.geometry("1100x700")
-        nb = ttk.Notebook(self)
+        self._printer_tree_vals = {}; self._search_after_id = None
+        self._material_built = False; self._compare_built = False
+        self._reload_printers_cache()
+        self.nb = nb = ttk.Notebook(self)
         self.tab_manage = ttk.Frame(nb)
         self.tab_material = ttk.Frame(nb)
         self.tab_compare = ttk.Frame(nb)
@@ -186,11 +249,20 @@ class App(tk.Tk):
         nb.add(self.tab_material, text="Verbrauchsmaterial")
         nb.add(self.tab_compare, text="Preisvergleich")
         nb.pack(fill="both", expand=True)
+        # Verbrauchsmaterial- und Vergleichs-Tab werden erst beim ersten Öffnen aufgebaut
+        nb.bind("<<NotebookTabChanged>>", self._on_tab)
         self.build_manage_tab()
-        self.build_material_tab()
-        self.build_compare_tab()
         self.refresh_printers()
 
+    def _on_tab(self, event=None):
+        tab = self.nb.select()
+        if tab == str(self.tab_material) and not self._material_built:
+            self.build_material_tab(); self._material_built = True
+            self._refresh_material_printers()
+        elif tab == str(self.tab_compare) and not self._compare_built:
+            self.build_compare_tab(); self._compare_built = True
+            self._refresh_compare_printers()
+
     # Manage Tab
     def build_manage_tab(self):
         frm = ttk.Frame(self.tab_manage); frm.pack(fill="both", expand=True, padx=10, pady=10)
@@ -204,7 +276,7 @@ class App(tk.Tk):
         ttk.Button(left, text="Löschen (ausgewählt)", command=self.delete_selected_printer).pack(fill="x", pady=5)
         ttk.Separator(left).pack(fill="x", pady=10)
         ttk.Label(left, text="Suche Modell: ").pack(anchor="w"); self.e_search = ttk.Entry(left); self.e_search.pack(fill="x")
-        self.e_search.bind("<KeyRelease>", lambda e: self.refresh_printers())
+        self.e_search.bind("<KeyRelease>", lambda e: self._on_search_key())
         ttk.Button(left, text="Exportiere Druckerliste (CSV)", command=self.export_printers_csv).pack(fill="x", pady=5)
 
         right = ttk.Frame(frm); right.pack(side="left", fill="both", expand=True)
@@ -221,49 +293,97 @@ class App(tk.Tk):
         model = self.e_model.get().strip()
         if not model:
             messagebox.showerror("Fehler","Modell darf nicht leer sein"); return
-        try:
-            price = float(self.e_price.get().strip().replace(",", "."))
-        except Exception:
+        price = to_float(self.e_price.get(), None)
+        if price is None:
             messagebox.showerror("Fehler","Ungültiger Preis"); return
         is_color = bool(self.var_is_color.get())
         try:
             add_printer_db(model, price, is_color)
+            self._reload_printers_cache()
         except Exception as e:
             messagebox.showerror("Fehler","Konnte Drucker nicht anlegen:\n"+str(e))
         self.e_model.delete(0,tk.END); self.e_price.delete(0,tk.END); self.var_is_color.set(0)
         self.refresh_printers()
 
+    def _on_search_key(self):
+        # Tastendrücke entprellen: erst nach 150 ms Ruhe neu filtern
+        if self._search_after_id is not None:
+            self.after_cancel(self._search_after_id)
+        self._search_after_id = self.after(150, self._run_search)
+
+    def _run_search(self):
+        self._search_after_id = None
+        self.refresh_printers_tree()
+
+    def _reload_printers_cache(self):
+        # Einzige Quelle für die Druckerliste im Speicher; nach jeder Änderung neu laden
+        cache = self._printers_cache = list_printers_db()
+        self._id2printer = {r["id"]: r for r in cache}
+        self._model2id = {r["model"]: r["id"] for r in cache}
+
+    def reload_printers(self):
+        self._reload_printers_cache()
+        self.refresh_printers()
+
     def refresh_printers(self):
-        for i in self.tree_printers.get_children(): self.tree_printers.delete(i)
-        filt = self.e_search.get().strip() if hasattr(self,'e_search') else None
-        for row in list_printers_db(filt):
-            pid, model, price, is_color = row
-            self.tree_printers.insert('',tk.END, values=(pid, model, f"{price:.2f}", "Ja" if is_color else "Nein"))
+        # Nach Änderungen an Druckern: Liste, Comboboxen und Vergleichsliste aktualisieren
+        self.refresh_printers_tree()
         self.refresh_printer_comboboxes()
 
+    def refresh_printers_tree(self):
+        # Nur geänderte Zeilen anfassen (iid = Drucker-ID) statt die ganze Liste neu aufzubauen
+        tree = self.tree_printers
+        filt = self.e_search.get().strip() if hasattr(self,'e_search') else None
+        if filt:
+            filt_cf = filt.casefold()
+            rows = [r for r in self._printers_cache if filt_cf in r["model"].casefold()]
+        else:
+            rows = self._printers_cache
+        vals = self._printer_tree_vals
+        wanted = {str(r["id"]) for r in rows}
+        gone = [iid for iid in tree.get_children() if iid not in wanted]
+        if gone:
+            tree.delete(*gone)
+            for iid in gone: del vals[iid]
+        order = list(tree.get_children())
+        insert = tree.insert; fmt2 = "{:.2f}".format
+        for idx, row in enumerate(rows):
+            pid = row["id"]
+            iid = str(pid)
+            v = (pid, row["model"], fmt2(row["price"]), "Ja" if row["is_color"] else "Nein")
+            if iid not in vals:
+                insert('', idx, iid=iid, values=v)
+                order.insert(idx, iid)
+            else:
+                if vals[iid] != v:
+                    tree.item(iid, values=v)
+                if order[idx] != iid:
+                    tree.move(iid, '', idx)
+                    order.remove(iid); order.insert(idx, iid)
+            vals[iid] = v
+
     def load_selected_printer_into_form(self):
         sel = self.tree_printers.selection()
         if not sel: return
         pid = int(self.tree_printers.item(sel[0])['values'][0])
-        p = get_printer_db(pid)
+        p = self._id2printer.get(pid)
         if not p: return
-        _, model, price, is_color = p
-        self.e_model.delete(0,tk.END); self.e_model.insert(0, model)
-        self.e_price.delete(0,tk.END); self.e_price.insert(0, f"{price:.2f}")
-        self.var_is_color.set(1 if is_color else 0)
+        self.e_model.delete(0,tk.END); self.e_model.insert(0, p["model"])
+        self.e_price.delete(0,tk.END); self.e_price.insert(0, f"{p['price']:.2f}")
+        self.var_is_color.set(1 if p["is_color"] else 0)
 
     def update_selected_printer(self):
         sel = self.tree_printers.selection()
         if not sel: messagebox.showinfo("Info","Kein Drucker ausgewählt"); return
         pid = int(self.tree_printers.item(sel[0])['values'][0])
         model = self.e_model.get().strip()
-        try:
-            price = float(self.e_price.get().strip().replace(",", "."))
-        except Exception:
+        price = to_float(self.e_price.get(), None)
+        if price is None:
             messagebox.showerror("Fehler","Ungültiger Preis"); return
         if not model:
             messagebox.showerror("Fehler","Ungültige Eingaben"); return
         update_printer_db(pid, model, price, bool(self.var_is_color.get()))
+        self._reload_printers_cache()
         self.refresh_printers()
 
     def delete_selected_printer(self):
@@ -271,7 +391,8 @@ class App(tk.Tk):
         if not sel: messagebox.showinfo("Info","Kein Drucker ausgewählt"); return
         pid = int(self.tree_printers.item(sel[0])['values'][0])
         if not messagebox.askyesno("Löschen?", "Drucker und zugehöriges Material löschen?"): return
-        delete_printer_db(pid); self.refresh_printers()
+        delete_printer_db(pid); self._reload_printers_cache()
+        self.refresh_printers()
 
     # Material tab
     def build_material_tab(self):
@@ -298,60 +419,62 @@ class App(tk.Tk):
         ttk.Button(right, text="Löschen (ausgewählt)", command=self.delete_selected_consumable_ui).pack(pady=5)
 
     def refresh_printer_comboboxes(self):
-        printers = list_printers_db()
-        models = [r[1] for r in printers]
-        self.printer_map = {r[1]: r[0] for r in printers}
-        try:
-            self.cb_printer_for_mat['values'] = models
-            if models and (not self.cb_printer_for_mat.get()):
-                self.cb_printer_for_mat.set(models[0])
-        except Exception:
-            pass
-        try:
-            # refresh compare listbox
-            self.listbox_compare.delete(0,tk.END)
-            for r in printers:
-                self.listbox_compare.insert(tk.END, r[1])
-        except Exception:
-            pass
+        # Nur bereits aufgebaute Tabs aktualisieren
+        if self._material_built:
+            self._refresh_material_printers()
+        if self._compare_built:
+            self._refresh_compare_printers()
+
+    def _refresh_material_printers(self):
+        models = [r["model"] for r in self._printers_cache]
+        self.cb_printer_for_mat['values'] = models
+        if models and (not self.cb_printer_for_mat.get()):
+            self.cb_printer_for_mat.set(models[0])
         self.refresh_material_tree()
 
+    def _refresh_compare_printers(self):
+        self.listbox_compare.delete(0,tk.END)
+        self.listbox_compare.insert(tk.END, *[r["model"] for r in self._printers_cache])
+
     def add_consumable_ui(self):
         printer_name = self.cb_printer_for_mat.get().strip()
         if not printer_name:
             messagebox.showerror("Fehler","Keinen Drucker ausgewählt"); return
-        pid = self.printer_map.get(printer_name)
+        pid = self._model2id.get(printer_name)
         if pid is None:
             messagebox.showerror("Fehler","Drucker nicht gefunden"); return
         kleur = self.cb_color.get().strip()
         if not kleur:
             messagebox.showerror("Fehler","Keine Farbe gewählt"); return
-        try:
-            price = float(self.e_mat_price.get().strip().replace(",", "."))
-            reach = int(float(self.e_mat_reach.get().strip().replace(",", ".")))
-        except Exception:
+        price = to_float(self.e_mat_price.get(), None)
+        reach = to_int(self.e_mat_reach.get(), None)
+        if price is None or reach is None:
             messagebox.showerror("Fehler","Ungültige Preis- oder Reichweitenangabe"); return
-        if kleur=="Cyan" and get_printer_db(pid)[3]==1:
+        if kleur=="Cyan" and self._id2printer[pid]["is_color"]==1:
             yes = messagebox.askyesno("Vorschlag","Möchtest du Preis und Reichweite auch für Magenta und Yellow übernehmen? (Du kannst sie später individuell anpassen)")
-            add_consumable_db(pid, "Cyan", price, reach)
             if yes:
-                add_consumable_db(pid, "Magenta", price, reach)
-                add_consumable_db(pid, "Yellow", price, reach)
+                add_consumables_db([(pid, k, price, reach) for k in ("Cyan", "Magenta", "Yellow")])
+            else:
+                add_consumable_db(pid, "Cyan", price, reach)
         else:
             add_consumable_db(pid, kleur, price, reach)
         self.e_mat_price.delete(0,tk.END); self.e_mat_reach.delete(0,tk.END)
         self.refresh_material_tree()
 
     def refresh_material_tree(self):
-        for i in self.tree_mat.get_children(): self.tree_mat.delete(i)
+        tree = self.tree_mat
+        children = tree.get_children()
+        if children: tree.delete(*children)
         v = self.cb_printer_for_mat.get().strip()
-        pid = self.printer_map.get(v) if v else None
+        pid = self._model2id.get(v) if v else None
         rows = list_consumables_db(pid)
-        pmap = {r[0]: r[1] for r in list_printers_db()}
+        id2printer = self._id2printer
+        insert = tree.insert; END = tk.END; fmt2 = "{:.2f}".format
         for r in rows:
-            cid, prid, kleur, price, reach = r
-            pname = pmap.get(prid, "??")
-            self.tree_mat.insert("",tk.END, iid=str(cid), values=(cid, pname, kleur, f"{price:.2f}", reach))
+            cid = r["id"]
+            p = id2printer.get(r["printer_id"])
+            pname = p["model"] if p else "??"
+            insert("", END, iid=str(cid), values=(cid, pname, r["kleur"], fmt2(r["price"]), r["reach"]))
 
     def delete_selected_consumable_ui(self):
         sel = self.tree_mat.selection()
@@ -364,35 +487,27 @@ class App(tk.Tk):
         pname = self.cb_printer_for_mat.get().strip()
         if not pname:
             messagebox.showerror("Fehler","Keinen Drucker gewählt"); return
-        pid = self.printer_map.get(pname)
+        pid = self._model2id.get(pname)
         if pid is None:
             messagebox.showerror("Fehler","Drucker nicht gefunden"); return
         c = get_consumable_db(pid, "Cyan")
         if not c:
             messagebox.showinfo("Info","Keine Cyan-Angabe vorhanden"); return
         price, reach = c
-        add_consumable_db(pid, "Magenta", price, reach); add_consumable_db(pid, "Yellow", price, reach)
+        add_consumables_db([(pid, "Magenta", price, reach), (pid, "Yellow", price, reach)])
         messagebox.showinfo("OK","Magenta und Yellow wurden übernommen (falls fehlend)")
         self.refresh_material_tree()
 
     def export_printers_csv(self):
         path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV","*.csv")], title="Druckerliste speichern als")
         if not path: return
-        rows = list_printers_db()
-        with open(path, "w", newline="", encoding="utf-8") as f:
-            w = csv.writer(f)
-            w.writerow(["id","model","price","is_color"])
-            for r in rows: w.writerow(r)
+        write_csv(path, ["id","model","price","is_color"], list_printers_db())
         messagebox.showinfo("Export", f"Druckerliste nach {path} exportiert.")
 
     def export_consumables_csv(self):
         path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV","*.csv")], title="Verbrauchsmaterial speichern als")
         if not path: return
-        rows = list_consumables_db()
-        with open(path, "w", newline="", encoding="utf-8") as f:
-            w = csv.writer(f)
-            w.writerow(["id","printer_id","color","price","reach"])
-            for r in rows: w.writerow(r)
+        write_csv(path, ["id","printer_id","color","price","reach"], list_consumables_db())
         messagebox.showinfo("Export", f"Verbrauchsmaterial nach {path} exportiert.")
 
     # Compare Tab
@@ -402,7 +517,7 @@ class App(tk.Tk):
         ttk.Label(left, text="Wähle Drucker für Vergleich (Mehrfachauswahl)").pack(anchor="w")
         self.listbox_compare = tk.Listbox(left, selectmode="extended", width=40, height=12)
         self.listbox_compare.pack(fill="y")
-        ttk.Button(left, text="Aktualisieren", command=self.refresh_printers).pack(fill="x", pady=5)
+        ttk.Button(left, text="Aktualisieren", command=self.reload_printers).pack(fill="x", pady=5)
         ttk.Label(left, text="Deckungsgrade und Farbanteil").pack(anchor="w", pady=(10,0))
         ttk.Label(left, text="S/W Deckung (%)").pack(anchor="w"); self.e_cov_sw = ttk.Entry(left); self.e_cov_sw.insert(0,"5"); self.e_cov_sw.pack(fill="x")
         ttk.Label(left, text="Farbdeckung (%)").pack(anchor="w"); self.e_cov_color = ttk.Entry(left); self.e_cov_color.insert(0,"5"); self.e_cov_color.pack(fill="x")
@@ -435,15 +550,14 @@ class App(tk.Tk):
     def load_profile_ui(self):
         profiles = load_profiles_db()
         if not profiles: messagebox.showinfo("Info","Keine Profile vorhanden"); return
-        names = [p[1] for p in profiles]
+        names = [p["name"] for p in profiles]
         sel = simpledialog.askstring("Profil wählen", f"Verfügbare Profile: {', '.join(names)}\nGib den Profilnamen ein:")
         if not sel: return
         for p in profiles:
-            if p[1]==sel:
-                _,_,cov_sw,cov_color,color_share = p
-                self.e_cov_sw.delete(0,tk.END); self.e_cov_sw.insert(0,str(cov_sw))
-                self.e_cov_color.delete(0,tk.END); self.e_cov_color.insert(0,str(cov_color))
-                self.e_color_share.delete(0,tk.END); self.e_color_share.insert(0,str(color_share))
+            if p["name"]==sel:
+                self.e_cov_sw.delete(0,tk.END); self.e_cov_sw.insert(0,str(p["cov_sw"]))
+                self.e_cov_color.delete(0,tk.END); self.e_cov_color.insert(0,str(p["cov_color"]))
+                self.e_color_share.delete(0,tk.END); self.e_color_share.insert(0,str(p["color_share"]))
                 return
         messagebox.showerror("Fehler","Profil nicht gefunden")
 
@@ -452,47 +566,33 @@ class App(tk.Tk):
         if not sel_idxs:
             messagebox.showinfo("Info","Keine Drucker gewählt"); return
         selected_models = [self.listbox_compare.get(i) for i in sel_idxs]
-        printers = list_printers_db()
-        model_to_id = {r[1]: r[0] for r in printers}
-        selected_ids = [model_to_id[m] for m in selected_models if m in model_to_id]
+        model2id = self._model2id
+        selected_ids = [model2id[m] for m in selected_models if m in model2id]
         cov_sw = to_float(self.e_cov_sw.get(), None); cov_color = to_float(self.e_cov_color.get(), None); color_share = to_float(self.e_color_share.get(), None)
         if cov_sw is None or cov_color is None or color_share is None:
             messagebox.showerror("Fehler","Ungültige Deckungsangaben"); return
+        consumables = list_consumables_for_printers_db(selected_ids)
         rows = []
         for pid in selected_ids:
-            p = get_printer_db(pid)
+            p = self._id2printer.get(pid)
             if not p: continue
-            _, model, price, is_color = p
-            sw_cost, color_cost, info = compute_costs_for_printer(pid, cov_sw, cov_color)
-            avg_cost = None
-            if sw_cost is not None and color_cost is not None:
-                avg_cost = (color_share/100.0)*color_cost + (1.0 - color_share/100.0)*sw_cost
-            rows.append({"id":pid, "model":model, "price":price, "sw_cost":sw_cost, "color_cost":color_cost, "avg_cost":avg_cost})
-        baseline = min(rows, key=lambda r: r["price"])
-        baseline_price = baseline["price"]; baseline_avg = baseline["avg_cost"]
-        for r in rows:
-            be = "-"
-            if r["id"]==baseline["id"]:
-                be = "-"
-            else:
-                if r["avg_cost"] is None or baseline_avg is None:
-                    be = "-"
-                else:
-                    if r["price"] > baseline_price and r["avg_cost"] < baseline_avg:
-                        denom = (baseline_avg - r["avg_cost"])
-                        if denom <= 0:
-                            be = "-"
-                        else:
-                            pages = int((r["price"] - baseline_price) / denom) + 1
-                            be = str(pages)
-                    else:
-                        be = "-"
-            r["break_even"] = be
-        for i in self.tree_compare.get_children(): self.tree_compare.delete(i)
-        for r in rows:
-            sws = f"{r['sw_cost']:.4f}" if r['sw_cost'] is not None else "n/a"
-            cols = (r['model'], f"{r['price']:.2f}", sws, (f"{r['color_cost']:.4f}" if r['color_cost'] is not None else "n/a"), (f"{r['avg_cost']:.4f}" if r['avg_cost'] is not None else "n/a"), r['break_even'])
-            self.tree_compare.insert("",tk.END, values=cols)
+            sw_cost, color_cost, info = compute_costs_for_printer(p, consumables[pid], cov_sw, cov_color)
+            rows.append({"id":pid, "model":p["model"], "price":p["price"], "sw_cost":sw_cost, "color_cost":color_cost})
+        avg_costs, break_evens = compare_costs([r["price"] for r in rows], [r["sw_cost"] for r in rows], [r["color_cost"] for r in rows], color_share)
+        for r, avg_cost, be in zip(rows, avg_costs, break_evens):
+            r["avg_cost"] = avg_cost; r["break_even"] = be
+        fmt2 = "{:.2f}".format; fmt4 = "{:.4f}".format
+        table = [(r['model'], fmt2(r['price']),
+                  fmt4(r['sw_cost']) if r['sw_cost'] is not None else "n/a",
+                  fmt4(r['color_cost']) if r['color_cost'] is not None else "n/a",
+                  fmt4(r['avg_cost']) if r['avg_cost'] is not None else "n/a",
+                  r['break_even']) for r in rows]
+        tree = self.tree_compare
+        children = tree.get_children()
+        if children: tree.delete(*children)
+        insert = tree.insert; END = tk.END
+        for cols in table:
+            insert("", END, values=cols)
         self._last_compare_rows = rows
 
     def export_compare_csv(self):
@@ -500,18 +600,18 @@ class App(tk.Tk):
             messagebox.showinfo("Info","Keine Vergleichsdaten vorhanden. Bitte zuerst 'Vergleichen' ausführen."); return
         path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV","*.csv")], title="Vergleich speichern als")
         if not path: return
-        with open(path, 'w', newline='', encoding='utf-8') as f:
-            w = csv.writer(f)
-            w.writerow(["model","price","sw_cost","color_cost","avg_cost","break_even"])
-            for r in self._last_compare_rows:
-                w.writerow([r['model'], r['price'], r['sw_cost'] if r['sw_cost'] is not None else '', r['color_cost'] if r['color_cost'] is not None else '', r['avg_cost'] if r['avg_cost'] is not None else '', r['break_even']])
+        write_csv(path, ["model","price","sw_cost","color_cost","avg_cost","break_even"],
+                  ([r['model'], r['price'], r['sw_cost'] if r['sw_cost'] is not None else '', r['color_cost'] if r['color_cost'] is not None else '', r['avg_cost'] if r['avg_cost'] is not None else '', r['break_even']] for r in self._last_compare_rows))
         messagebox.showinfo("Export", f"Vergleich nach {path} exportiert.")
 
 # Run
 def main():
     init_db()
-    app = App()
-    app.mainloop()
+    try:
+        app = App()
+        app.mainloop()
+    finally:
+        close_db()
 
 if __name__ == '__main__':
     main()